@@ -2,26 +2,43 @@
 """
 Integral Solver Web App (Flask + Manim)
 
-All *.mp4 (partials + final) end up directly in  static/videos/
-No media/, 1080p60/, or other quality sub‑folders survive the cleanup.
+Manim writes each final *.mp4 to  static/videos/<uuid>.part.mp4  and it is
+renamed to  <uuid>.mp4  once complete, so a file under that name is always
+a finished video.
+Partial movie files go to a scratch dir (tmpfs when available) that is
+deleted as soon as the render finishes.
 """
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from uuid import uuid4
-import threading
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
 import shutil
-from typing import Dict
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from flask import (
     Flask,
+    Response,
+    abort,
     render_template,
     request,
     redirect,
+    send_from_directory,
     url_for,
     flash,
     jsonify,
 )
 
+os.environ["SYMPY_USE_CACHE"] = "yes"   # SymPy reads it on import
 import sympy
 from sympy.parsing.sympy_parser import (
     parse_expr,
@@ -30,109 +47,474 @@ from sympy.parsing.sympy_parser import (
     convert_xor,
 )
 
-from manim import Scene, MathTex, ReplacementTransform, config as mconfig
+from manim import (
+    Scene,
+    MathTex,
+    ReplacementTransform,
+    CairoRenderer,
+    SceneFileWriter,
+    TexTemplate,
+    config as mconfig,
+)
+from manim.utils.tex_file_writing import delete_nonsvg_files
 
 # ------------------------------------------------------------------------- #
 APP = Flask(__name__)
 APP.secret_key = "change‑me"
+# e.g. "/_videos" when nginx fronts the app – see video()
+APP.config["X_ACCEL_PREFIX"] = os.environ.get("X_ACCEL_PREFIX", "")
 
 ROOT_DIR  = Path(__file__).parent.resolve()
 VIDEO_DIR = ROOT_DIR / "static" / "videos"
 VIDEO_DIR.mkdir(parents=True, exist_ok=True)
 
+# Manim's TeX/Text SVG cache, kept out of the public video folder and
+# shared by every render so repeated equation fragments skip LaTeX
+CACHE_DIR = ROOT_DIR / ".manim_cache"
+(CACHE_DIR / "Tex").mkdir(parents=True, exist_ok=True)   # before workers race
+
+# per‑render scratch space for partial movies; RAM‑backed on Linux
+SCRATCH_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
 _transformations = standard_transformations + (
     implicit_multiplication_application,
     convert_xor,
 )
 
-TASKS: Dict[str, str] = {}      # vid → "pending" | "ready" | "error:<msg>"
+# vid → (state, last update); state is "pending" | "rendering:<done>/<total>"
+# | "ready" | "error:<msg>".
+# Kept in update order so entries idle for TASK_TTL can be dropped from the
+# front – finished videos stay discoverable on disk after that. Jobs still
+# pending or rendering are re‑stamped instead, however long they wait.
+TASK_TTL = 60 * 60
+TASKS: Dict[str, Tuple[str, float]] = {}
+_TASKS_LOCK = threading.Lock()
+
+# ?quality=… → (pixel_height, pixel_width, frame_rate)
+QUALITY_PRESETS: Dict[str, Tuple[int, int, int]] = {
+    "low":  (480, 854, 30),
+    "med":  (720, 1280, 30),
+    "high": (1080, 1920, 60),
+}
+DEFAULT_QUALITY = "low"
+
+# SymPy's LaTeX only needs the AMS packages; Manim's default preamble also
+# loads babel, which every one of the three LaTeX runs per render pays for.
+TEX_TEMPLATE = TexTemplate(preamble=r"""
+\usepackage{amsmath}
+\usepackage{amssymb}
+""")
+
+# Manim's config is process‑global, so renders are queued and run one at a
+# time instead of each submission forking its own LaTeX + FFmpeg pipeline.
+RENDER_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+
+# The SymPy half of a submission runs ahead of that queue, in solver
+# processes that are killed once a job exceeds SOLVE_TIMEOUT seconds –
+# some ordinary‑looking integrals never finish.
+SOLVE_WORKERS = 2
+SOLVE_TIMEOUT = 30
+SOLVE_POOL = ThreadPoolExecutor(max_workers=SOLVE_WORKERS,
+                                thread_name_prefix="solve")
+
+# Child processes are always spawned: forking from the render thread while
+# request threads hold logging/Rich locks can leave a child deadlocked.
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+TEX_TIMEOUT = 60     # seconds for one render's LaTeX precompile
+
+# Finished renders keyed by a hash of the parsed integral, so identical
+# submissions are redirected to the existing MP4 instead of re-rendering.
+# The index lists every video UUID, so it must stay outside the served
+# static tree.
+RENDER_CACHE_FILE = ROOT_DIR / ".render_cache.json"
+try:
+    RENDER_CACHE: Dict[str, str] = json.loads(RENDER_CACHE_FILE.read_text())
+except (OSError, ValueError):
+    RENDER_CACHE = {}           # key → mp4 name in VIDEO_DIR
 
 # ------------------------------------------------------------------------- #
-def _flatten_to_video_dir(src_dir: Path) -> None:
+def _set_task(vid: str, state: str) -> None:
+    now = time.monotonic()
+    with _TASKS_LOCK:
+        TASKS.pop(vid, None)
+        TASKS[vid] = (state, now)
+        while TASKS:
+            old, (old_state, stamp) = next(iter(TASKS.items()))
+            if now - stamp < TASK_TTL:
+                break
+            del TASKS[old]
+            if old_state == "pending" or old_state.startswith("rendering:"):
+                TASKS[old] = (old_state, now)   # still queued – keep it
+
+
+def _task_state(vid: str) -> Optional[str]:
+    entry = TASKS.get(vid)
+    return entry[0] if entry else None
+
+# ------------------------------------------------------------------------- #
+_BASE_LD = {
+    "sin": sympy.sin, "cos": sympy.cos, "tan": sympy.tan,
+    "exp": sympy.exp, "log": sympy.log, "pi": sympy.pi, "E": sympy.E,
+}
+
+
+def _local_dict(var: str) -> Dict[str, sympy.Basic]:
+    """Fresh parse namespace for *var*; parse_expr() eval()s into it."""
+    return {**_BASE_LD, var: sympy.Symbol(var)}
+
+
+@lru_cache(maxsize=512)
+def _parse(text: str, var: str) -> sympy.Expr:
     """
-    Move every *.mp4 found under *src_dir* (recursively) into VIDEO_DIR.
-    Skip files that are *already* in VIDEO_DIR. Remove empty directories.
+    SymPy expression for *text*; safe to share, expressions are immutable.
+    _local_dict() builds a fresh dict – input like "(x:=5)" would
+    otherwise rebind x for every later parse.
     """
-    if not src_dir.exists():
-        return
+    return parse_expr(text, _local_dict(var), transformations=_transformations)
 
-    for mp4 in src_dir.rglob("*.mp4"):
-        if mp4.parent == VIDEO_DIR:    # already at destination
-            continue
-        dest = VIDEO_DIR / mp4.name
-        if dest.exists():
-            dest.unlink()
-        shutil.move(mp4, dest)
 
-    # prune empty directories depth‑first
-    for p in sorted(src_dir.rglob("*"), reverse=True):
+@lru_cache(maxsize=512)
+def _parse_latex(text: str, var: str) -> str:
+    """
+    LaTeX for *text* parsed with *var* as the integration variable.
+    Cached because the live preview re-sends every field on each keystroke.
+    """
+    return sympy.latex(_parse(text, var))
+
+
+def _warmup() -> None:
+    """Run integrate/simplify/latex once so the first render starts warm."""
+    x = sympy.symbols("x")
+    sympy.latex(sympy.integrate(sympy.sin(x) * x, x))
+    sympy.simplify(sympy.sin(x) ** 2 + sympy.cos(x) ** 2)
+
+
+@lru_cache(maxsize=128)
+def _integrate(expr: sympy.Expr, *args) -> sympy.Expr:
+    """
+    sympy.integrate(), memoised across renders: users re‑submit an integrand
+    with new bounds, and the same integral at another quality.
+    """
+    return sympy.integrate(expr, *args)
+
+
+def _at(F: sympy.Expr, x: sympy.Symbol, value: sympy.Expr) -> sympy.Expr:
+    """
+    F evaluated at x = value, kept exact for the on‑screen F(b) − F(a) step.
+    xreplace skips subs()' pattern matching; it would also rewrite the bound
+    variable of an unevaluated Integral, so those still go through subs().
+    """
+    if F.has(sympy.Integral):
+        return F.subs(x, value)
+    return F.xreplace({x: value})
+
+
+def _solve(integrand: str, var: str, lower_s: str, upper_s: str,
+           full_simplify: bool) -> Tuple[str, str, str]:
+    """The three MathTex strings of the animation; runs in a solver process."""
+    x = sympy.Symbol(var)
+
+    expr   = _parse(integrand, var)
+    F      = _integrate(expr, x)
+    lower  = _parse(lower_s, var)
+    upper  = _parse(upper_s, var)
+    result = _integrate(expr, (x, lower, upper))
+
+    # bounds are typeset from the parsed values, not the raw strings, so
+    # the video depends only on what _render_key hashes
+    lo_tex, up_tex = sympy.latex(lower), sympy.latex(upper)
+    expr_tex  = rf"\int_{{{lo_tex}}}^{{{up_tex}}} {sympy.latex(expr)}\,d{var}"
+    anti_tex  = rf"\left[{sympy.latex(F)}\right]_{{{lo_tex}}}^{{{up_tex}}}"
+    eval_tex  = rf"{sympy.latex(_at(F, x, upper))} - {sympy.latex(_at(F, x, lower))}"
+    # simplify() tries every rewrite and can take seconds; integrate()
+    # already returns canonical results, so it is opt‑in (?simplify=1)
+    final_tex = sympy.latex(sympy.simplify(result) if full_simplify
+                            else result)
+
+    return expr_tex, anti_tex, rf"{eval_tex} = {final_tex}"
+
+# ------------------------------------------------------------------------- #
+def _solver_main(conn) -> None:
+    """Solver process: warm up, then answer (fn, args) calls until EOF."""
+    _warmup()
+    conn.send(None)
+    while True:
+        try:
+            fn, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, fn(*args)))
+        except Exception as exc:
+            conn.send((False, f"{exc}"))
+
+
+class _Solver:
+    """
+    A long‑lived SymPy process, so the parse/integrate caches stay warm
+    between jobs. A call that overruns its timeout kills the process; the
+    next call starts a fresh one.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._proc = None
+        self._conn = None
+        self._ready = False
+
+    def start(self) -> None:
+        with self._lock:
+            if self._proc is not None and self._proc.is_alive():
+                return
+            self._conn, child = _MP_CONTEXT.Pipe()
+            self._proc = _MP_CONTEXT.Process(target=_solver_main,
+                                             args=(child,), daemon=True)
+            self._proc.start()
+            child.close()
+            self._ready = False
+
+    def _kill(self) -> None:
+        self._proc.kill()
+        self._proc.join()
+        self._proc = None
+
+    def call(self, fn: Callable[..., Any], *args, timeout: float) -> Any:
+        self.start()
         try:
-            p.rmdir()
-        except OSError:
-            pass
+            if not self._ready:         # startup isn't charged to the job
+                self._conn.recv()
+                self._ready = True
+            self._conn.send((fn, args))
+            done = self._conn.poll(timeout)
+            if done:
+                ok, value = self._conn.recv()
+        except (EOFError, OSError):
+            self._kill()
+            raise RuntimeError("solver process died")
+        if not done:
+            self._kill()
+            raise TimeoutError(f"SymPy took longer than {timeout} s")
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+
+# one solver per SOLVE_POOL thread, checked out for the length of a job
+_SOLVERS: "queue.Queue[_Solver]" = queue.Queue()
+for _ in range(SOLVE_WORKERS):
+    _SOLVERS.put(_Solver())
 
 # ------------------------------------------------------------------------- #
-def generate_integral_video(integrand: str,
-                            var: str,
-                            lower_s: str,
-                            upper_s: str,
-                            outfile: Path,
-                            vid: str) -> None:
-    TASKS[vid] = "pending"
+def _render_key(integrand: sympy.Expr, var: str, lower: sympy.Expr,
+                upper: sympy.Expr, quality: str, full_simplify: bool) -> str:
+    """Keyed on the parsed expressions, so "x^2" and "x**2" share a render."""
+    exprs = "|".join(sympy.srepr(e) for e in (integrand, lower, upper))
+    raw = f"{exprs}|{var}|{quality}|{int(full_simplify)}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def _cached_render(key: str) -> Optional[Path]:
+    """Return the MP4 previously rendered for *key*, if it still exists."""
+    name = RENDER_CACHE.get(key)
+    if name is None:
+        return None
+    path = VIDEO_DIR / name
+    return path if path.exists() else None
+
+
+def _remember_render(key: str, outfile: Path) -> None:
+    RENDER_CACHE[key] = outfile.name
+    RENDER_CACHE_FILE.write_text(json.dumps(RENDER_CACHE))
+
+# ------------------------------------------------------------------------- #
+_HW_ENCODERS = ("h264_nvenc", "h264_amf", "h264_videotoolbox")
+
+
+@lru_cache(maxsize=1)
+def _video_encoder() -> str:
+    """
+    First hardware H.264 encoder that FFmpeg can actually open on this
+    machine, else libx264. Builds often list nvenc/amf without the GPU to
+    back them, so each candidate gets a one‑frame trial encode.
+    """
+    for enc in _HW_ENCODERS:
+        try:
+            subprocess.run(
+                [mconfig.ffmpeg_executable, "-hide_banner", "-loglevel", "error",
+                 "-f", "lavfi", "-i", "color=black:s=256x256",
+                 "-frames:v", "1", "-c:v", enc, "-f", "null", "-"],
+                check=True, capture_output=True, timeout=10,
+            )
+            return enc
+        except (OSError, subprocess.SubprocessError):
+            continue
+    return "libx264"
+
+
+class _EncoderFileWriter(SceneFileWriter):
+    """SceneFileWriter that encodes partial movies with _video_encoder()."""
+
+    def open_movie_pipe(self, file_path=None):
+        if file_path is None:
+            file_path = self.partial_movie_files[self.renderer.num_plays]
+        self.partial_movie_file_path = file_path
+
+        command = [
+            mconfig.ffmpeg_executable,
+            "-y",
+            "-f", "rawvideo",
+            "-s", f"{mconfig.pixel_width}x{mconfig.pixel_height}",
+            "-pix_fmt", "rgba",
+            "-r", str(int(mconfig.frame_rate)),
+            "-i", "-",
+            "-an",
+            "-loglevel", mconfig.ffmpeg_loglevel.lower(),
+            "-vcodec", _video_encoder(),
+            "-pix_fmt", "yuv420p",
+            str(file_path),
+        ]
+        self.writing_process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+# ------------------------------------------------------------------------- #
+@lru_cache(maxsize=1)
+def _tex_pool() -> ProcessPoolExecutor:
+    """
+    LaTeX workers for _precompile_tex, one per MathTex of a render. Long‑lived,
+    since each spawned child re‑imports this module; built on first use so
+    those imports don't each create a pool of their own.
+    """
+    return ProcessPoolExecutor(max_workers=3, mp_context=_MP_CONTEXT)
+
+
+def _precompile_tex(tex: str) -> None:
+    """
+    Typeset one MathTex in a worker process. The SVG lands in Manim's Tex
+    cache, so the scene's own MathTex(tex) finds it instead of running LaTeX.
+    """
+    tex_dir = CACHE_DIR / "Tex"
+    tex_dir.mkdir(parents=True, exist_ok=True)  # Manim's own mkdir() races
+    mconfig.tex_dir          = str(tex_dir)
+    mconfig.tex_template     = TEX_TEMPLATE
+    mconfig.no_latex_cleanup = True     # siblings share tex_dir; parent cleans
+    MathTex(tex)
+
+# ------------------------------------------------------------------------- #
+def solve_integral(integrand: str,
+                   var: str,
+                   lower_s: str,
+                   upper_s: str,
+                   quality: str,
+                   full_simplify: bool,
+                   outfile: Path,
+                   vid: str,
+                   key: str) -> None:
+    """Run the SymPy step on a solver, then queue the Manim render."""
+    solver = _SOLVERS.get()
     try:
-        # 1) Force Manim to use static/videos
-        mconfig.media_dir = str(VIDEO_DIR)
-        mconfig.video_dir = str(VIDEO_DIR)          # Manim ≥ 0.20
+        tex_strings = solver.call(_solve, integrand, var, lower_s, upper_s,
+                                  full_simplify, timeout=SOLVE_TIMEOUT)
+    except Exception as exc:
+        APP.logger.warning("solving %r failed: %s", integrand, exc)
+        _set_task(vid, f"error:{exc}")
+        return
+    finally:
+        _SOLVERS.put(solver)
 
-        # 2) SymPy – build integral
-        x  = sympy.symbols(var)
-        ld = {"sin": sympy.sin, "cos": sympy.cos, "pi": sympy.pi, var: x}
+    RENDER_POOL.submit(generate_integral_video,
+                       tex_strings, quality, outfile, vid, key)
 
-        expr   = parse_expr(integrand, ld, transformations=_transformations)
-        F      = sympy.integrate(expr, x)
-        lower  = parse_expr(lower_s, ld, transformations=_transformations)
-        upper  = parse_expr(upper_s, ld, transformations=_transformations)
-        result = sympy.integrate(expr, (x, lower, upper))
 
-        expr_tex  = rf"\int_{{{lower_s}}}^{{{upper_s}}} {sympy.latex(expr)}\,d{var}"
-        anti_tex  = rf"\left[{sympy.latex(F)}\right]_{{{lower_s}}}^{{{upper_s}}}"
-        eval_tex  = rf"{sympy.latex(F.subs(x, upper))} - {sympy.latex(F.subs(x, lower))}"
-        final_tex = sympy.latex(sympy.simplify(result))
+def generate_integral_video(tex_strings: Tuple[str, str, str],
+                            quality: str,
+                            outfile: Path,
+                            vid: str,
+                            key: str) -> None:
+    _set_task(vid, "pending")
+    partial = VIDEO_DIR / f"{outfile.stem}.part{outfile.suffix}"
+    scratch = None
+    try:
+        scratch = tempfile.mkdtemp(prefix="mathvis-", dir=SCRATCH_ROOT)
 
-        # 3) Manim scene
+        # 1) Only the final movie goes to static/videos; everything else
+        #    Manim creates under media_dir (images/, …) lands in scratch
+        mconfig.media_dir = scratch
+        mconfig.video_dir = str(VIDEO_DIR)          # Manim ≥ 0.20
+        mconfig.partial_movie_dir = scratch
+
+        height, width, fps = QUALITY_PRESETS[quality]
+        mconfig.pixel_height = height
+        mconfig.pixel_width  = width
+        mconfig.frame_rate   = fps
+        mconfig.tex_template = TEX_TEMPLATE
+        mconfig.tex_dir      = str(CACHE_DIR / "Tex")
+        mconfig.text_dir     = str(CACHE_DIR / "Text")
+
+        # write the final movie as <uuid>.part.mp4, renamed when done; partial
+        # movies are throw‑away, so skip hashing every animation to cache them
+        mconfig.output_file     = partial.stem
+        mconfig.disable_caching = True
+
+        # the three LaTeX + dvisvgm runs are independent – do them at once
+        list(_tex_pool().map(_precompile_tex, tex_strings, timeout=TEX_TIMEOUT))
+        delete_nonsvg_files()
+
+        # 2) Manim scene
         class IntegralScene(Scene):
+            # pause() is a play() too, so progress counts the three holds
+            # as steps alongside the two transforms
+            n_plays = 5     # pause, transform, pause, transform, pause
+
+            def play(self_inner, *args, **kwargs):
+                super().play(*args, **kwargs)
+                _set_task(vid, f"rendering:{self_inner.renderer.num_plays}"
+                               f"/{self_inner.n_plays}")
+
             def construct(self_inner):
-                eq1 = MathTex(expr_tex)
-                eq2 = MathTex(anti_tex)
-                eq3 = MathTex(rf"{eval_tex} = {final_tex}")
-                self_inner.play(eq1.animate.scale(1))
-                self_inner.wait(1)
+                eq1, eq2, eq3 = (MathTex(t) for t in tex_strings)
+                # holds are paused so each still is rasterized only once
+                self_inner.add(eq1)
+                self_inner.pause(2)
                 self_inner.play(ReplacementTransform(eq1, eq2))
-                self_inner.wait(1)
+                self_inner.pause(1)
                 self_inner.play(ReplacementTransform(eq2, eq3))
-                self_inner.wait(2)
+                self_inner.pause(2)
 
-        scene = IntegralScene()
+        scene = IntegralScene(
+            renderer=CairoRenderer(file_writer_class=_EncoderFileWriter)
+        )
         scene.render()
+        partial.replace(outfile)
 
-        # 4) Move final movie to UUID filename
-        shutil.move(Path(scene.renderer.file_writer.movie_file_path), outfile)
-
-        # 5) Flatten partial movie files
-        partial_root = VIDEO_DIR / "partial_movie_files"
-        _flatten_to_video_dir(partial_root)
-
-        # 6) Flatten any quality sub‑folders created by Manim (1080p60, …)
-        for sub in VIDEO_DIR.iterdir():
-            if sub.is_dir() and sub.name != "partial_movie_files":
-                _flatten_to_video_dir(sub)
-
-        TASKS[vid] = "ready"
+        _remember_render(key, outfile)
+        _set_task(vid, "ready")
 
     except Exception as exc:
         APP.logger.exception("video render failed")
+        partial.unlink(missing_ok=True)
         outfile.unlink(missing_ok=True)
-        TASKS[vid] = f"error:{exc}"
+        _set_task(vid, f"error:{exc}")
+
+    finally:
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+# ------------------------------------------------------------------------- #
+_warmup_started = False
+
+
+@APP.before_request
+def _start_warmup() -> None:
+    """
+    Start the solver processes, which warm SymPy, ahead of the first job.
+    Done on the first request rather than at import, so pool children and
+    tooling that merely import app never pay for it.
+    """
+    global _warmup_started
+    if not _warmup_started:
+        _warmup_started = True
+        for solver in list(_SOLVERS.queue):
+            solver.start()
 
 # ------------------------------------------------------------------------- #
 @APP.route("/", methods=["GET", "POST"])
@@ -142,17 +524,38 @@ def index():
                 for k in ("integrand", "variable", "lower", "upper")}
         if not all(form.values()):
             flash("Please fill in the integrand and all bounds.", "danger")
-            return redirect(url_for("index"))
+            return redirect(url_for("index", **request.args))
+
+        # reject bad input here rather than in a queued render
+        try:
+            if not form["variable"].isidentifier():
+                raise ValueError(form["variable"])
+            integrand, lower, upper = (_parse(form[k], form["variable"])
+                                       for k in ("integrand", "lower", "upper"))
+        except Exception:
+            flash("Could not parse the integrand or bounds.", "danger")
+            return redirect(url_for("index", **request.args))
+
+        quality = request.args.get("quality", DEFAULT_QUALITY)
+        if quality not in QUALITY_PRESETS:
+            quality = DEFAULT_QUALITY
+        full_simplify = request.args.get("simplify") == "1"
 
         vid        = f"{uuid4().hex}.mp4"
         video_path = VIDEO_DIR / vid
+        key        = _render_key(integrand, form["variable"], lower, upper,
+                                 quality, full_simplify)
 
-        threading.Thread(
-            target=generate_integral_video,
-            args=(form["integrand"], form["variable"],
-                  form["lower"], form["upper"], video_path, vid),
-            daemon=False
-        ).start()
+        # identical videos share one file instead of a copy per submission
+        cached = _cached_render(key)
+        if cached is not None:
+            return redirect(url_for("result", vid=cached.name))
+
+        _set_task(vid, "pending")
+        SOLVE_POOL.submit(solve_integral,
+                          form["integrand"], form["variable"],
+                          form["lower"], form["upper"], quality,
+                          full_simplify, video_path, vid, key)
 
         return redirect(url_for("result", vid=vid))
 
@@ -165,17 +568,42 @@ def result(vid: str):
     return render_template(
         "result.html",
         vid=vid,
-        video_url=url_for("static", filename=f"videos/{vid}"),
-        ready=video_path.exists(),
+        video_url=url_for("video", vid=vid),
+        ready=_task_state(vid) in (None, "ready") and video_path.is_file(),
     )
 
+# ------------------------------------------------------------------------- #
+@APP.route("/video/<vid>")
+def video(vid: str):
+    """
+    Stream a finished MP4. Behind nginx, set X_ACCEL_PREFIX and let nginx
+    send the bytes so no Flask worker is tied up:
+
+        location /_videos/ { internal; alias /path/to/static/videos/;
+                             sendfile on; tcp_nopush on; }
+    """
+    prefix = APP.config["X_ACCEL_PREFIX"]
+    if prefix:
+        if not (VIDEO_DIR / vid).is_file():
+            abort(404)
+        return Response(headers={"X-Accel-Redirect": f"{prefix}/{vid}",
+                                 "Content-Type": "video/mp4"})
+    return send_from_directory(VIDEO_DIR, vid, mimetype="video/mp4")
+
 # ------------------------------------------------------------------------- #
 @APP.route("/status/<vid>")
 def status(vid: str):
-    state = TASKS.get(vid, "pending")
+    state = _task_state(vid)
+    if state is None:           # expired or from before a restart
+        # <uuid>.mp4 only appears once a render completes, so anything else
+        # failed, was cut off by a restart, or never existed
+        state = ("ready" if (VIDEO_DIR / vid).is_file()
+                 else "error:render was interrupted or has expired")
     return jsonify({
         "ready": state == "ready",
         "error": state if state.startswith("error:") else None,
+        "progress": (state.partition(":")[2]
+                     if state.startswith("rendering:") else None),
     })
 
 # ------------------------------------------------------------------------- #
@@ -188,26 +616,14 @@ def latex_preview():
     upper     = data.get("upper", "").strip()
 
     try:
-        x  = sympy.symbols(variable)
-        ld = {"sin": sympy.sin, "cos": sympy.cos, "pi": sympy.pi, variable: x}
-
-        expr_tex = sympy.latex(
-            parse_expr(integrand, ld, transformations=_transformations)
-        ) if integrand else ""
-
-        lower_tex = sympy.latex(
-            parse_expr(lower, ld, transformations=_transformations)
-        ) if lower else ""
-
-        upper_tex = sympy.latex(
-            parse_expr(upper, ld, transformations=_transformations)
-        ) if upper else ""
+        expr_tex  = _parse_latex(integrand, variable) if integrand else ""
+        lower_tex = _parse_latex(lower, variable) if lower else ""
+        upper_tex = _parse_latex(upper, variable) if upper else ""
 
         return jsonify({"expr": expr_tex, "lower": lower_tex, "upper": upper_tex})
 
     except Exception:
         return jsonify({"expr": "", "lower": "", "upper": ""})
 
-# ------------------------------------------------------------------------- #
 if __name__ == "__main__":
     APP.run(debug=True, use_reloader=False)